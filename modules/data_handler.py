@@ -1,8 +1,27 @@
+import logging
+import os
+import time
+import hashlib
+import tempfile
 import yfinance as yf
 import pandas as pd
 import numpy as np
 
-def fetch_data(tickers, period='5y', interval='1d'):
+logger = logging.getLogger(__name__)
+
+# Maximum number of tickers requested from Yahoo Finance in a single download
+MAX_TICKERS_PER_DOWNLOAD = 20
+
+# On-disk cache for downloaded price data
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.portoptima_cache')
+CACHE_TTL = 24 * 60 * 60  # Seconds before cached prices are re-downloaded
+
+def _cache_path(tickers, period, interval):
+    """Return the cache file path for a download request."""
+    key = repr((tuple(sorted(tickers)), period, interval)).encode()
+    return os.path.join(CACHE_DIR, f"{hashlib.blake2b(key).hexdigest()[:16]}.pkl")
+
+def fetch_data(tickers, period='5y', interval='1d', use_cache=True):
     """
     Fetch historical price data for given tickers.
     
@@ -14,47 +33,63 @@ def fetch_data(tickers, period='5y', interval='1d'):
         Period for historical data (e.g., '5y', '1y', '6mo')
     interval : str
         Data interval (e.g., '1d', '1wk', '1mo')
+    use_cache : bool, default=True
+        Whether to reuse prices downloaded within the last CACHE_TTL seconds
     
     Returns:
     --------
     pd.DataFrame
         DataFrame with adjusted close prices
     """
+    cache_path = _cache_path(tickers, period, interval)
+    if use_cache and os.path.exists(cache_path):
+        if time.time() - os.path.getmtime(cache_path) < CACHE_TTL:
+            return pd.read_pickle(cache_path)
+    
     try:
-        # Download data
-        data = yf.download(tickers, period=period, interval=interval)
+        # Download in batches to stay within Yahoo's URL length limit; auto_adjust
+        # returns adjusted prices in 'Close', so no 'Adj Close' lookup is needed
+        price_frames = []
+        for start in range(0, len(tickers), MAX_TICKERS_PER_DOWNLOAD):
+            batch = tickers[start:start + MAX_TICKERS_PER_DOWNLOAD]
+            data = yf.download(batch, period=period, interval=interval, threads=True,
+                               auto_adjust=True, progress=False, group_by='column')
+            if data.empty:
+                continue
+            
+            if isinstance(data.columns, pd.MultiIndex):
+                price_frames.append(data['Close'])
+            else:
+                price_frames.append(data[['Close']].rename(columns={'Close': batch[0]}))
         
-        if data.empty:
+        if not price_frames:
             raise ValueError("No data retrieved for the given tickers")
         
-        # Check if 'Adj Close' exists in the columns
-        if 'Adj Close' in data.columns:
-            price_data = data['Adj Close']
-        # If we have a multi-level column index
-        elif isinstance(data.columns, pd.MultiIndex) and 'Adj Close' in data.columns.levels[0]:
-            price_data = data['Adj Close']
-        # Fallback to 'Close' if 'Adj Close' is not available
-        elif 'Close' in data.columns:
-            print("Warning: 'Adj Close' not found. Using 'Close' prices instead.")
-            price_data = data['Close']
-        elif isinstance(data.columns, pd.MultiIndex) and 'Close' in data.columns.levels[0]:
-            print("Warning: 'Adj Close' not found. Using 'Close' prices instead.")
-            price_data = data['Close']
-        else:
-            # If neither 'Adj Close' nor 'Close' is found, use the first available column
-            print("Warning: Neither 'Adj Close' nor 'Close' found. Using first available price column.")
-            price_data = data.iloc[:, 0]
+        price_data = pd.concat(price_frames, axis=1)
         
-        # If only one ticker, yfinance returns a Series; convert to DataFrame
-        if isinstance(price_data, pd.Series):
-            price_data = price_data.to_frame(name=tickers[0])
+        if use_cache:
+            # Write to a temporary file first so concurrent readers never see a partial file
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+            os.close(fd)
+            price_data.to_pickle(tmp_path)
+            os.replace(tmp_path, cache_path)
         
         return price_data
     except Exception as e:
-        print(f"Error details: {str(e)}")
-        print(f"Data columns: {data.columns if 'data' in locals() else 'No data retrieved'}")
+        logger.info(f"Error details: {str(e)}")
+        logger.info(f"Data columns: {data.columns if 'data' in locals() else 'No data retrieved'}")
         raise Exception(f"Error fetching data: {str(e)}")
 
+def _last_per_period(prices, freq):
+    """Return the last prices of each period, labelled with the period's last day."""
+    # Grouping on periods is cheaper than resample's offset-based binning. The
+    # labels are converted back to timestamps so every frequency has a
+    # DatetimeIndex, at midnight like resample's.
+    last = prices.groupby(prices.index.to_period(freq)).last()
+    last.index = last.index.to_timestamp(how='end').normalize()
+    return last
+
 def calculate_returns(prices, frequency='daily'):
     """
     Calculate returns from price data.
@@ -74,9 +109,9 @@ def calculate_returns(prices, frequency='daily'):
     if frequency == 'daily':
         returns = prices.pct_change().dropna()
     elif frequency == 'weekly':
-        returns = prices.resample('W').last().pct_change().dropna()
+        returns = _last_per_period(prices, 'W').pct_change().dropna()
     elif frequency == 'monthly':
-        returns = prices.resample('M').last().pct_change().dropna()
+        returns = _last_per_period(prices, 'M').pct_change().dropna()
     else:
         raise ValueError("Invalid frequency. Choose from 'daily', 'weekly', or 'monthly'")
     
@@ -1,7 +1,7 @@
+import logging
 import os
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from data_handler import fetch_data, calculate_returns
 from portfolio import Portfolio
@@ -103,7 +103,6 @@ def run_example():
         
         # Plot efficient frontier
         print("Plotting efficient frontier...")
-        plt.figure(figsize=(12, 8))
         plot_efficient_frontier(
             results, 
             current_portfolio_dict, 
@@ -140,4 +139,6 @@ def run_example():
         traceback.print_exc()
 
 if __name__ == "__main__":
+    # Show the messages logged while plotting
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     run_example()
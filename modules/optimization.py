@@ -1,9 +1,62 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
-from portfolio import Portfolio
+from scipy.linalg import cho_factor, cho_solve
+from portfolio import Portfolio, covariance_matrix
+from data_handler import get_annualization_factor
 
-def simulate_random_portfolios(returns, num_simulations=10000, risk_free_rate=0.02, frequency='daily'):
+# Number of simulated portfolios evaluated per vectorized batch
+SIMULATION_BATCH_SIZE = 65536
+
+# SLSQP tolerance for the (scaled) variance objectives
+VARIANCE_FTOL = 1e-10
+
+def _covariance_factor(sigma):
+    """
+    Factor a covariance matrix as sigma = L @ L.T.
+    
+    Uses the Cholesky factor, falling back to an eigendecomposition when sigma
+    is only positive semi-definite (e.g. duplicated assets), so that portfolio
+    variance can be computed as ||L.T @ w||^2.
+    """
+    try:
+        return np.linalg.cholesky(sigma)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(sigma)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+def _simulate_batch(weights, mu, sigma_factor, risk_free_rate):
+    """
+    Calculate metrics for a batch of portfolios.
+    
+    Parameters:
+    -----------
+    weights : np.ndarray
+        Portfolio weights, one row per portfolio
+    mu : np.ndarray
+        Annualized expected returns
+    sigma_factor : np.ndarray
+        Factor L of the annualized covariance matrix (sigma = L @ L.T)
+    risk_free_rate : float
+        Annual risk-free rate
+    
+    Returns:
+    --------
+    np.ndarray
+        Array with [return, volatility, sharpe ratio] for each portfolio
+    """
+    portfolio_returns = weights @ mu
+    factored = weights @ sigma_factor
+    portfolio_volatilities = np.sqrt(np.einsum('ij,ij->i', factored, factored))
+    sharpe_ratios = (portfolio_returns - risk_free_rate) / portfolio_volatilities
+    
+    return np.column_stack((portfolio_returns, portfolio_volatilities, sharpe_ratios))
+
+def simulate_random_portfolios(returns, num_simulations=10000, risk_free_rate=0.02, frequency='daily',
+                               seed=None):
     """
     Generate random portfolios and calculate metrics.
     
@@ -17,36 +70,125 @@ def simulate_random_portfolios(returns, num_simulations=10000, risk_free_rate=0.
         Annual risk-free rate
     frequency : str
         Return frequency ('daily', 'weekly', 'monthly')
+    seed : int, optional
+        Seed for the random number generator
     
     Returns:
     --------
     tuple
         (results, weights_record)
-        results: array with [return, volatility, sharpe ratio] for each portfolio
-        weights_record: array with weights for each portfolio
+        results: float32 array with [return, volatility, sharpe ratio] for each portfolio
+        weights_record: float32 array with weights for each portfolio
     """
     num_assets = returns.shape[1]
-    results = np.zeros((num_simulations, 3))  # Return, volatility, Sharpe ratio
-    weights_record = np.zeros((num_simulations, num_assets))
-    
-    for i in range(num_simulations):
-        # Generate random weights
-        weights = np.random.random(num_assets)
-        weights = weights / np.sum(weights)  # Normalize to sum to 1
-        weights_record[i, :] = weights
-        
-        # Calculate portfolio metrics
-        portfolio = Portfolio(returns, weights, risk_free_rate, frequency)
-        metrics = portfolio.metrics
-        
-        results[i, 0] = metrics['expected_return']
-        results[i, 1] = metrics['volatility']
-        results[i, 2] = metrics['sharpe_ratio']
+    
+    # Moments are constant across simulations, so compute them once. The
+    # simulation only feeds a scatter plot, so it runs in single precision.
+    ann_factor = get_annualization_factor(frequency)
+    mu = (returns.values.mean(axis=0) * ann_factor).astype(np.float32)
+    sigma_factor = _covariance_factor(covariance_matrix(returns.values) * ann_factor)
+    sigma_factor = sigma_factor.astype(np.float32)
+    
+    # Sample weights uniformly from the simplex (all weights positive, summing to 1).
+    # Normalized standard exponentials are Dirichlet(1, ..., 1) distributed.
+    rng = np.random.default_rng(seed)
+    weights_record = rng.standard_exponential((num_simulations, num_assets), dtype=np.float32)
+    weights_record /= weights_record.sum(axis=1, keepdims=True)
+    
+    # Return, volatility, Sharpe ratio
+    results = np.empty((num_simulations, 3), dtype=np.float32)
+    batch_starts = range(0, num_simulations, SIMULATION_BATCH_SIZE)
+    
+    def run_batch(start):
+        stop = start + SIMULATION_BATCH_SIZE
+        results[start:stop] = _simulate_batch(weights_record[start:stop], mu, sigma_factor,
+                                             risk_free_rate)
+    
+    # Batches are independent and NumPy releases the GIL, so spread them across cores
+    if len(batch_starts) > 1:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(run_batch, batch_starts))
+    else:
+        run_batch(0)
     
     return results, weights_record
 
+@lru_cache(maxsize=16)
+def _cached_covariance_factor(sigma_bytes, num_assets):
+    """Covariance factor memoized on the raw bytes of the covariance matrix."""
+    sigma = np.frombuffer(sigma_bytes).reshape(num_assets, num_assets)
+    sigma_factor = _covariance_factor(sigma)
+    sigma_factor.flags.writeable = False  # Shared between calls
+    return sigma_factor
+
+def _annualized_covariance_factor(cov_matrix, ann_factor):
+    """
+    Return the factor L of the annualized covariance matrix (sigma = L @ L.T).
+    
+    Optimizations over the same moments (e.g. every point of the efficient
+    frontier) reuse the same factor instead of refactoring the matrix.
+    """
+    sigma = np.ascontiguousarray(cov_matrix * ann_factor, dtype=np.float64)
+    return _cached_covariance_factor(sigma.tobytes(), sigma.shape[0])
+
+def _make_objective(target, mu, sigma_factor, risk_free_rate):
+    """
+    Build the objective function for a target.
+    
+    The objective returns its value together with its analytical gradient, so
+    the intermediate products (sigma @ w) are shared between the two.
+    
+    Variance is minimized instead of volatility: the square root is monotonic,
+    so the optimum is the same. Variance is evaluated as ||L.T @ w||^2 and divided
+    by the mean asset variance. Annualized variances are around 1e-2, which is
+    too small for SLSQP's default tolerance to reach the optimum.
+    
+    Parameters:
+    -----------
+    target : str
+        Optimization target ('sharpe', 'min_volatility', 'max_return', 'target_return')
+    mu : np.ndarray
+        Annualized expected returns
+    sigma_factor : np.ndarray
+        Factor L of the annualized covariance matrix (sigma = L @ L.T)
+    risk_free_rate : float
+        Annual risk-free rate
+    
+    Returns:
+    --------
+    callable
+        Objective returning (value, gradient), for minimize(..., jac=True)
+    """
+    # Transpose once so every evaluation uses a contiguous matrix
+    sigma_factor_t = np.ascontiguousarray(sigma_factor.T)
+    
+    if target == 'sharpe':
+        def objective(weights):
+            factored = sigma_factor_t @ weights
+            sigma_w = sigma_factor @ factored
+            volatility = np.sqrt(factored @ factored)
+            excess_return = weights @ mu - risk_free_rate
+            value = -excess_return / volatility
+            gradient = -(mu / volatility - excess_return * sigma_w / volatility**3)
+            return value, gradient
+    elif target in ('min_volatility', 'target_return'):
+        # Mean of the diagonal of sigma = L @ L.T
+        scale = 1 / np.mean(np.sum(sigma_factor**2, axis=1))
+        
+        def objective(weights):
+            factored = sigma_factor_t @ weights
+            return scale * (factored @ factored), 2 * scale * (sigma_factor @ factored)
+    elif target == 'max_return':
+        def objective(weights):
+            return -(weights @ mu), -mu
+    else:
+        raise ValueError("Invalid optimization target")
+    
+    return objective
+
 def optimize_portfolio(returns, risk_free_rate=0.02, frequency='daily', 
-                        target='sharpe', target_return=None, min_weight=0, max_weight=1):
+                        target='sharpe', target_return=None, min_weight=0, max_weight=1,
+                        expected_returns=None, cov_matrix=None):
     """
     Optimize portfolio based on target.
     
@@ -66,6 +208,10 @@ def optimize_portfolio(returns, risk_free_rate=0.02, frequency='daily',
         Minimum weight for any asset
     max_weight : float
         Maximum weight for any asset
+    expected_returns : np.ndarray, optional
+        Precomputed mean return of each asset (not annualized)
+    cov_matrix : np.ndarray, optional
+        Precomputed covariance matrix (not annualized)
     
     Returns:
     --------
@@ -74,60 +220,100 @@ def optimize_portfolio(returns, risk_free_rate=0.02, frequency='daily',
     """
     num_assets = returns.shape[1]
     
-    # Create initial portfolio with equal weights
+    # Start from equal weights
     initial_weights = np.array([1/num_assets] * num_assets)
-    portfolio = Portfolio(returns, initial_weights, risk_free_rate, frequency)
+    
+    # Annualized moments shared by the objectives and constraints. The objectives
+    # work on these directly, so no Portfolio is needed until the optimum is found.
+    if expected_returns is None:
+        expected_returns = returns.values.mean(axis=0)
+    if cov_matrix is None:
+        cov_matrix = covariance_matrix(returns.values)
+    ann_factor = get_annualization_factor(frequency)
+    mu = expected_returns * ann_factor
+    sigma_factor = _annualized_covariance_factor(cov_matrix, ann_factor)
     
     # Define constraints
-    constraints = [{'type': 'eq', 'fun': lambda x: np.sum(x) - 1}]  # Weights sum to 1
+    constraints = [{
+        'type': 'eq',
+        'fun': lambda x: np.sum(x) - 1,  # Weights sum to 1
+        'jac': lambda x: np.ones_like(x)
+    }]
     
     if target == 'target_return' and target_return is not None:
-        ann_factor = portfolio.get_annualization_factor()
-        expected_returns = portfolio.expected_returns
         constraints.append({
             'type': 'eq',
-            'fun': lambda x: ann_factor * np.sum(expected_returns * x) - target_return
+            'fun': lambda x: x @ mu - target_return,
+            'jac': lambda x: mu
         })
     
     # Define bounds
     bounds = tuple((min_weight, max_weight) for _ in range(num_assets))
     
-    # Define objective function based on target
-    if target == 'sharpe':
-        def objective(weights):
-            portfolio.update_weights(weights)
-            return -portfolio.metrics['sharpe_ratio']
-    elif target == 'min_volatility':
-        def objective(weights):
-            portfolio.update_weights(weights)
-            return portfolio.metrics['volatility']
-    elif target == 'max_return':
-        def objective(weights):
-            portfolio.update_weights(weights)
-            return -portfolio.metrics['expected_return']
-    elif target == 'target_return':
-        def objective(weights):
-            portfolio.update_weights(weights)
-            return portfolio.metrics['volatility']
-    else:
-        raise ValueError("Invalid optimization target")
+    # Define objective function and its analytical gradient based on target
+    objective = _make_objective(target, mu, sigma_factor, risk_free_rate)
     
-    # Optimize
-    result = minimize(objective, initial_weights, method='SLSQP', 
-                      bounds=bounds, constraints=constraints)
+    # Optimize. The variance objectives are cheap convex quadratics, so they are
+    # run to a tighter tolerance than SLSQP's default
+    options = {'ftol': VARIANCE_FTOL} if target in ('min_volatility', 'target_return') else {}
+    result = minimize(objective, initial_weights, method='SLSQP', jac=True,
+                      bounds=bounds, constraints=constraints, options=options)
     
     if not result['success']:
         raise ValueError(f"Optimization failed: {result['message']}")
     
     # Calculate metrics for the optimized portfolio
     optimal_weights = result['x']
-    portfolio.update_weights(optimal_weights)
+    portfolio = Portfolio(returns, optimal_weights, risk_free_rate, frequency,
+                          expected_returns, cov_matrix)
     
     return {
         'weights': optimal_weights,
         'metrics': portfolio.metrics
     }
 
+def _analytical_frontier(mu, sigma, target_returns):
+    """
+    Compute minimum-variance portfolios in closed form (Markowitz frontier).
+    
+    Only the budget constraint is taken into account, so the weights are the
+    bounded optimum only where they happen to fall within the weight bounds.
+    
+    Parameters:
+    -----------
+    mu : np.ndarray
+        Annualized expected returns
+    sigma : np.ndarray
+        Annualized covariance matrix
+    target_returns : np.ndarray
+        Target portfolio returns
+    
+    Returns:
+    --------
+    tuple or None
+        (weights, variances) for each target return, or None if the covariance
+        matrix is singular or all expected returns are equal
+    """
+    try:
+        factor = cho_factor(sigma)
+    except np.linalg.LinAlgError:
+        return None
+    
+    ones = np.ones_like(mu)
+    cov_inv_one, cov_inv_mu = cho_solve(factor, np.column_stack((ones, mu))).T
+    a = ones @ cov_inv_one
+    b = mu @ cov_inv_one
+    c = mu @ cov_inv_mu
+    d = a * c - b**2
+    if d <= np.finfo(float).eps * a * c:
+        return None
+    
+    weights = (np.outer(c - b * target_returns, cov_inv_one) + 
+               np.outer(a * target_returns - b, cov_inv_mu)) / d
+    variances = (a * target_returns**2 - 2 * b * target_returns + c) / d
+    
+    return weights, variances
+
 def get_efficient_frontier(returns, risk_free_rate=0.02, frequency='daily', 
                            points=50, min_weight=0, max_weight=1):
     """
@@ -153,13 +339,21 @@ def get_efficient_frontier(returns, risk_free_rate=0.02, frequency='daily',
     pd.DataFrame
         DataFrame with returns and volatilities for the efficient frontier
     """
+    # Moments are shared by every optimization, so compute them once
+    expected_returns = returns.values.mean(axis=0)
+    cov_matrix = covariance_matrix(returns.values)
+    
     # Find min and max return portfolios
     min_vol_portfolio = optimize_portfolio(returns, risk_free_rate, frequency, 
                                           'min_volatility', min_weight=min_weight, 
-                                          max_weight=max_weight)
+                                          max_weight=max_weight,
+                                          expected_returns=expected_returns,
+                                          cov_matrix=cov_matrix)
     max_return_portfolio = optimize_portfolio(returns, risk_free_rate, frequency, 
                                              'max_return', min_weight=min_weight, 
-                                             max_weight=max_weight)
+                                             max_weight=max_weight,
+                                             expected_returns=expected_returns,
+                                             cov_matrix=cov_matrix)
     
     min_return = min_vol_portfolio['metrics']['expected_return']
     max_return = max_return_portfolio['metrics']['expected_return']
@@ -167,20 +361,41 @@ def get_efficient_frontier(returns, risk_free_rate=0.02, frequency='daily',
     # Generate target returns
     target_returns = np.linspace(min_return, max_return, points)
     
-    # Calculate efficient frontier
-    efficient_frontier = []
-    for target_return in target_returns:
+    # Frontier points; failed optimizations are left as NaN and dropped
+    frontier_returns = np.full(points, np.nan)
+    frontier_volatilities = np.full(points, np.nan)
+    
+    # Closed-form frontier, used wherever its weights respect the bounds
+    ann_factor = get_annualization_factor(frequency)
+    mu = expected_returns * ann_factor
+    sigma = cov_matrix * ann_factor
+    analytical = _analytical_frontier(mu, sigma, target_returns)
+    if analytical is not None:
+        frontier_weights, frontier_variances = analytical
+        tolerance = 1e-10
+        within_bounds = np.all((frontier_weights >= min_weight - tolerance) & 
+                               (frontier_weights <= max_weight + tolerance), axis=1)
+        frontier_returns[within_bounds] = target_returns[within_bounds]
+        frontier_volatilities[within_bounds] = np.sqrt(frontier_variances[within_bounds])
+    else:
+        within_bounds = np.zeros(points, dtype=bool)
+    
+    # Fall back to numerical optimization where the bounds are active
+    for i in np.flatnonzero(~within_bounds):
         try:
             portfolio = optimize_portfolio(returns, risk_free_rate, frequency, 
-                                          'target_return', target_return=target_return,
-                                          min_weight=min_weight, max_weight=max_weight)
+                                          'target_return', target_return=target_returns[i],
+                                          min_weight=min_weight, max_weight=max_weight,
+                                          expected_returns=expected_returns,
+                                          cov_matrix=cov_matrix)
             
-            efficient_frontier.append({
-                'return': portfolio['metrics']['expected_return'],
-                'volatility': portfolio['metrics']['volatility']
-            })
+            frontier_returns[i] = portfolio['metrics']['expected_return']
+            frontier_volatilities[i] = portfolio['metrics']['volatility']
         except:
             # Skip if optimization fails
             continue
     
-    return pd.DataFrame(efficient_frontier)
+    return pd.DataFrame({
+        'return': frontier_returns,
+        'volatility': frontier_volatilities
+    }).dropna().reset_index(drop=True)
@@ -1,12 +1,90 @@
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.linalg.blas import dsyrk
+
+def covariance_matrix(returns):
+    """
+    Calculate the sample covariance matrix of returns.
+    
+    Uses a BLAS symmetric rank-k update on the centered data, which only
+    computes one triangle of the matrix.
+    
+    Parameters:
+    -----------
+    returns : np.ndarray
+        Array of asset returns with one column per asset
+    
+    Returns:
+    --------
+    np.ndarray
+        Covariance matrix (num_assets x num_assets)
+    """
+    centered = returns - returns.mean(axis=0)
+    # The transpose of a C-ordered array is Fortran-ordered, so BLAS uses it without a copy
+    lower = dsyrk(1.0 / (len(returns) - 1), centered.T, lower=1)
+    return lower + np.tril(lower, -1).T
+
+def _metrics(weights, mu_ann, sigma_ann, risk_free_rate):
+    """
+    Calculate annualized return, volatility and Sharpe ratio in one pass.
+    
+    Returns:
+    --------
+    tuple
+        (expected_return, volatility, sharpe_ratio)
+    """
+    portfolio_return = weights @ mu_ann
+    portfolio_volatility = np.sqrt(weights @ sigma_ann @ weights)
+    sharpe_ratio = (portfolio_return - risk_free_rate) / portfolio_volatility
+    
+    return portfolio_return, portfolio_volatility, sharpe_ratio
+
+def compute_kpi_sparklines(returns, weights, window=30, ann_factor=252):
+    """
+    Calculate rolling portfolio KPIs for sparkline plots.
+    
+    Parameters:
+    -----------
+    returns : pd.DataFrame
+        DataFrame with asset returns
+    weights : array-like
+        Asset weights
+    window : int, default=30
+        Number of periods in each window, at least 2 and at most the number of returns
+    ann_factor : int, default=252
+        Annualization factor for the return frequency (see Portfolio.get_annualization_factor)
+    
+    Returns:
+    --------
+    dict
+        Dictionary with one array per KPI ('expected_return', 'volatility' and
+        'cumulative_return'), holding one value per window
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    
+    # The volatility needs at least two returns per window
+    if not 2 <= window <= len(returns):
+        raise ValueError(f"Invalid window. Choose between 2 and the number of returns ({len(returns)})")
+    
+    # Portfolio return series, with each window a view into it
+    portfolio_returns = np.einsum('ta,a->t', returns, weights)
+    windows = sliding_window_view(portfolio_returns, window)
+    
+    return {
+        'expected_return': windows.mean(axis=1) * ann_factor,
+        'volatility': windows.std(axis=1, ddof=1) * np.sqrt(ann_factor),
+        'cumulative_return': np.prod(1 + windows, axis=1) - 1
+    }
 
 class Portfolio:
     """
     Class for analyzing investment portfolios.
     """
     
-    def __init__(self, returns, weights=None, risk_free_rate=0.02, frequency='daily'):
+    def __init__(self, returns, weights=None, risk_free_rate=0.02, frequency='daily',
+                 expected_returns=None, cov_matrix=None):
         """
         Initialize a Portfolio object.
         
@@ -20,8 +98,14 @@ class Portfolio:
             Annual risk-free rate
         frequency : str
             Return frequency ('daily', 'weekly', 'monthly')
+        expected_returns : np.ndarray, optional
+            Precomputed mean return of each asset. Calculated from returns if None.
+        cov_matrix : np.ndarray, optional
+            Precomputed covariance matrix. Calculated from returns if None.
         """
         self.returns = returns
+        # Contiguous float64 copy of the returns used for all numerical work
+        self._X = np.ascontiguousarray(returns.values, dtype=np.float64)
         self.assets = returns.columns.tolist()
         self.num_assets = len(self.assets)
         
@@ -31,25 +115,34 @@ class Portfolio:
         else:
             weights = np.array(weights)
             # Ensure weights sum to 1
-            if not np.isclose(sum(weights), 1.0):
-                weights = weights / sum(weights)
+            if not np.isclose(weights.sum(), 1.0):
+                weights = weights / weights.sum()
             self.weights = weights
             
         self.risk_free_rate = risk_free_rate
         self.frequency = frequency
+        self._ann_factor = self.get_annualization_factor()
         
         # Calculate metrics
-        self.expected_returns = self._calculate_expected_returns()
-        self.cov_matrix = self._calculate_covariance_matrix()
+        if expected_returns is None:
+            expected_returns = self._calculate_expected_returns()
+        if cov_matrix is None:
+            cov_matrix = self._calculate_covariance_matrix()
+        self.expected_returns = expected_returns
+        self.cov_matrix = cov_matrix
+        
+        # Annualized moments used by calculate_metrics
+        self._mu_ann = expected_returns * self._ann_factor
+        self._sigma_ann = cov_matrix * self._ann_factor
         self.metrics = self.calculate_metrics()
     
     def _calculate_expected_returns(self):
         """Calculate expected returns for each asset."""
-        return self.returns.mean()
+        return self._X.mean(axis=0)
     
     def _calculate_covariance_matrix(self):
         """Calculate covariance matrix of returns."""
-        return self.returns.cov()
+        return covariance_matrix(self._X)
     
     def get_annualization_factor(self):
         """Return the annualization factor for the frequency."""
@@ -64,20 +157,10 @@ class Portfolio:
     
     def calculate_metrics(self):
         """Calculate portfolio metrics."""
-        # Annualization factor
-        ann_factor = self.get_annualization_factor()
-        
-        # Portfolio expected return (annualized)
-        portfolio_return = np.sum(self.expected_returns * self.weights) * ann_factor
-        
-        # Portfolio volatility (annualized)
-        portfolio_volatility = np.sqrt(
-            np.dot(self.weights.T, np.dot(self.cov_matrix * ann_factor, self.weights))
+        portfolio_return, portfolio_volatility, sharpe_ratio = _metrics(
+            self.weights, self._mu_ann, self._sigma_ann, self.risk_free_rate
         )
         
-        # Sharpe ratio
-        sharpe_ratio = (portfolio_return - self.risk_free_rate) / portfolio_volatility
-        
         return {
             'expected_return': portfolio_return,
             'volatility': portfolio_volatility,
@@ -88,8 +171,8 @@ class Portfolio:
         """Update portfolio weights and recalculate metrics."""
         # Ensure weights sum to 1
         new_weights = np.array(new_weights)
-        if not np.isclose(sum(new_weights), 1.0):
-            new_weights = new_weights / sum(new_weights)
+        if not np.isclose(new_weights.sum(), 1.0):
+            new_weights = new_weights / new_weights.sum()
         
         self.weights = new_weights
         self.metrics = self.calculate_metrics()
@@ -1,7 +1,8 @@
 import argparse
+import logging
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
 from data_handler import fetch_data, calculate_returns
@@ -11,11 +12,30 @@ from visualization import (
     plot_efficient_frontier, 
     plot_asset_allocation, 
     plot_correlation_matrix,
-    plot_performance_summary
+    plot_performance_summary,
+    generate_plots
 )
 
-def parse_arguments():
-    """Parse command line arguments."""
+# Named explicitly, since __name__ is '__main__' when run as a script
+logger = logging.getLogger('portfolio_analyzer')
+
+# Loggers that report the progress of an analysis
+ANALYSIS_LOGGERS = ('portfolio_analyzer', 'data_handler', 'visualization')
+
+def add_log_handler(handler):
+    """Send the progress messages of analyses to a logging handler."""
+    for name in ANALYSIS_LOGGERS:
+        analysis_logger = logging.getLogger(name)
+        analysis_logger.setLevel(logging.INFO)
+        analysis_logger.addHandler(handler)
+
+def remove_log_handler(handler):
+    """Stop sending the progress messages of analyses to a logging handler."""
+    for name in ANALYSIS_LOGGERS:
+        logging.getLogger(name).removeHandler(handler)
+
+def parse_arguments(argv=None):
+    """Parse command line arguments, from sys.argv unless argv is given."""
     parser = argparse.ArgumentParser(description='Analyze and optimize investment portfolios')
     
     # Required arguments
@@ -48,170 +68,220 @@ def parse_arguments():
     parser.add_argument('--no-show', action='store_true',
                         help='Do not show interactive plots (just save them)')
     
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-def main():
-    """Main function."""
-    try:
-        args = parse_arguments()
-        
-        # Create output directory if it doesn't exist
-        if not os.path.exists(args.output_dir):
-            os.makedirs(args.output_dir)
-        
-        # Get tickers and weights
-        tickers = args.tickers
+def run(tickers, weights=None, period='5y', interval='1d', risk_free_rate=0.02, 
+        frequency='daily', num_simulations=10000, optimization='sharpe', 
+        target_return=None, min_weight=0, max_weight=1, output_dir='output', show=False, 
+        parallel_plots=False):
+    """
+    Analyze and optimize a portfolio and save the visualizations.
+    
+    Progress is reported through logging rather than printed, see add_log_handler.
+    
+    Parameters:
+    -----------
+    tickers : list
+        List of asset tickers
+    weights : list, optional
+        List of asset weights. If None, equal weights are used
+    period : str, default='5y'
+        Period for historical data
+    interval : str, default='1d'
+        Data interval
+    risk_free_rate : float, default=0.02
+        Annual risk-free rate
+    frequency : str, default='daily'
+        Return frequency ('daily', 'weekly', 'monthly')
+    num_simulations : int, default=10000
+        Number of simulated portfolios
+    optimization : str, default='sharpe'
+        Optimization target ('sharpe', 'min_volatility', 'max_return', 'target_return')
+    target_return : float, optional
+        Target return (only if optimization='target_return')
+    min_weight : float, default=0
+        Minimum weight for any asset
+    max_weight : float, default=1
+        Maximum weight for any asset
+    output_dir : str, default='output'
+        Directory to save the visualizations in
+    show : bool, default=False
+        Whether to display the plots or just save them
+    parallel_plots : bool, default=False
+        Whether to render the plots in the shared plot process pool. Only worth it
+        in long-lived processes, which start the pool once and reuse it
         
-        # Set equal weights if not provided
-        if args.weights:
-            weights = args.weights
-            if len(weights) != len(tickers):
-                raise ValueError("Number of weights must match number of tickers")
-            # Normalize weights to sum to 1
-            if abs(sum(weights) - 1.0) > 1e-6:
-                print(f"Warning: Weights sum to {sum(weights)}, normalizing to 1.0")
-                weights = [w/sum(weights) for w in weights]
+    Returns:
+    --------
+    dict
+        Dictionary with the tickers, the current and optimal portfolios and the efficient frontier
+    """
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Set equal weights if not provided
+    if weights:
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(tickers):
+            raise ValueError("Number of weights must match number of tickers")
+        # Normalize weights to sum to 1
+        total = weights.sum()
+        if abs(total - 1.0) > 1e-6:
+            logger.info(f"Warning: Weights sum to {total}, normalizing to 1.0")
+            weights /= total
+    else:
+        weights = np.full(len(tickers), 1.0/len(tickers))  # Equal weights
+    
+    logger.info(f"Fetching data for {tickers}...")
+    prices = fetch_data(tickers, period, interval)
+    
+    # Check if we got data for all tickers
+    if prices.shape[1] != len(tickers):
+        logger.info(f"Warning: Data only available for {prices.shape[1]} out of {len(tickers)} tickers")
+        # Adjust weights for tickers we have data for
+        if isinstance(prices.columns, pd.MultiIndex):
+            available_tickers = list(set([col[1] for col in prices.columns]))
         else:
-            weights = [1.0/len(tickers)] * len(tickers)  # Equal weights
-        
-        print(f"Fetching data for {tickers}...")
-        prices = fetch_data(tickers, args.period, args.interval)
-        
-        # Check if we got data for all tickers
-        if prices.shape[1] != len(tickers):
-            print(f"Warning: Data only available for {prices.shape[1]} out of {len(tickers)} tickers")
-            # Adjust weights for tickers we have data for
-            if isinstance(prices.columns, pd.MultiIndex):
-                available_tickers = list(set([col[1] for col in prices.columns]))
-            else:
-                available_tickers = prices.columns.tolist()
-            print(f"Available tickers: {available_tickers}")
-            
-            # Create a mapping of available tickers to their original weights
-            ticker_weight_map = {tick: w for tick, w in zip(tickers, weights)}
-            
-            # Adjust tickers and weights lists
-            tickers = available_tickers
-            weights = [ticker_weight_map.get(tick, 0) for tick in tickers]
-            
-            # Normalize weights again
-            weights = [w/sum(weights) for w in weights]
-            
-            print(f"Adjusted portfolio: {list(zip(tickers, weights))}")
-        
-        print("Calculating returns...")
-        returns = calculate_returns(prices, args.frequency)
+            available_tickers = prices.columns.tolist()
+        logger.info(f"Available tickers: {available_tickers}")
         
-        # Print data information for debugging
-        print(f"Data period: {prices.index[0]} to {prices.index[-1]}")
-        print(f"Number of data points: {len(prices)}")
+        # Align the original weights with the available tickers. A ticker entered more
+        # than once keeps its last weight, since reindex needs unique labels.
+        adjusted = pd.Series(weights, index=tickers)
+        adjusted = adjusted[~adjusted.index.duplicated(keep='last')]
+        adjusted = adjusted.reindex(available_tickers, fill_value=0.0)
         
-        print("Creating portfolio...")
-        current_portfolio = Portfolio(
-            returns, 
-            weights, 
-            args.risk_free_rate, 
-            args.frequency
-        )
+        # Normalize weights again
+        adjusted /= adjusted.sum()
         
-        print(f"Simulating {args.num_simulations} portfolios...")
-        results, weights_record = simulate_random_portfolios(
-            returns, 
-            args.num_simulations, 
-            args.risk_free_rate, 
-            args.frequency
-        )
+        # Adjust tickers and weights
+        tickers = available_tickers
+        weights = adjusted.to_numpy()
         
-        print("Optimizing portfolio...")
-        optimal_portfolio = optimize_portfolio(
-            returns, 
+        logger.info(f"Adjusted portfolio: {list(zip(tickers, weights))}")
+    
+    logger.info("Calculating returns...")
+    returns = calculate_returns(prices, frequency)
+    
+    # Log data information for debugging
+    logger.info(f"Data period: {prices.index[0]} to {prices.index[-1]}")
+    logger.info(f"Number of data points: {len(prices)}")
+    
+    logger.info("Creating portfolio...")
+    current_portfolio = Portfolio(
+        returns, 
+        weights, 
+        risk_free_rate, 
+        frequency
+    )
+    
+    logger.info(f"Simulating {num_simulations} portfolios...")
+    results, weights_record = simulate_random_portfolios(
+        returns, 
+        num_simulations, 
+        risk_free_rate, 
+        frequency
+    )
+    
+    logger.info("Optimizing portfolio...")
+    optimal_portfolio = optimize_portfolio(
+        returns, 
+        risk_free_rate, 
+        frequency, 
+        optimization, 
+        target_return, 
+        min_weight, 
+        max_weight
+    )
+    
+    logger.info("Generating efficient frontier...")
+    efficient_frontier = get_efficient_frontier(
+        returns, 
+        risk_free_rate, 
+        frequency, 
+        points=50, 
+        min_weight=min_weight, 
+        max_weight=max_weight
+    )
+    
+    # Log summary
+    logger.info("\n--- Portfolio Analysis Summary ---")
+    logger.info("\nCurrent Portfolio:")
+    logger.info(f"Expected Annual Return: {current_portfolio.metrics['expected_return']*100:.2f}%")
+    logger.info(f"Annual Volatility: {current_portfolio.metrics['volatility']*100:.2f}%")
+    logger.info(f"Sharpe Ratio: {current_portfolio.metrics['sharpe_ratio']:.2f}")
+    
+    logger.info("\nOptimal Portfolio:")
+    logger.info(f"Expected Annual Return: {optimal_portfolio['metrics']['expected_return']*100:.2f}%")
+    logger.info(f"Annual Volatility: {optimal_portfolio['metrics']['volatility']*100:.2f}%")
+    logger.info(f"Sharpe Ratio: {optimal_portfolio['metrics']['sharpe_ratio']:.2f}")
+    
+    logger.info("\nOptimal Asset Allocation:")
+    for i, ticker in enumerate(tickers):
+        logger.info(f"{ticker}: {optimal_portfolio['weights'][i]*100:.2f}%")
+    
+    # Generate visualizations
+    logger.info("\nGenerating visualizations...")
+    
+    # Add risk-free rate to current_portfolio for the capital market line
+    current_portfolio_dict = {
+        'metrics': current_portfolio.metrics,
+        'weights': current_portfolio.weights,
+        'risk_free_rate': risk_free_rate
+    }
+    
+    # The plots are independent, so they can be rendered concurrently
+    plot_kwargs = {'show_plot': show, 'output_dir': output_dir}
+    generate_plots([
+        ('efficient frontier', plot_efficient_frontier, 
+         (results, current_portfolio_dict, optimal_portfolio, efficient_frontier), plot_kwargs),
+        ('asset allocation', plot_asset_allocation, 
+         ({'weights': current_portfolio.weights}, optimal_portfolio, tickers), plot_kwargs),
+        ('correlation matrix', plot_correlation_matrix, (returns,), plot_kwargs),
+        ('performance summary', plot_performance_summary, (optimal_portfolio,), plot_kwargs)
+    ], show_plot=show, parallel=parallel_plots)
+    
+    logger.info("\nAnalysis complete!")
+    logger.info(f"Visualization files saved in: {os.path.abspath(output_dir)}")
+    
+    return {
+        'tickers': tickers,
+        'current_portfolio': current_portfolio_dict,
+        'optimal_portfolio': optimal_portfolio,
+        'efficient_frontier': efficient_frontier
+    }
+
+def main(args=None):
+    """
+    Main function.
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace or list, optional
+        Parsed arguments, or a list of arguments to parse. If None, sys.argv is parsed
+    """
+    # Print the progress of the analysis
+    handler = logging.StreamHandler(sys.stdout)
+    add_log_handler(handler)
+    
+    try:
+        if not isinstance(args, argparse.Namespace):
+            args = parse_arguments(args)
+        run(
+            args.tickers, 
+            args.weights, 
+            args.period, 
+            args.interval, 
             args.risk_free_rate, 
             args.frequency, 
+            args.num_simulations, 
             args.optimization, 
             args.target_return, 
             args.min_weight, 
-            args.max_weight
-        )
-        
-        print("Generating efficient frontier...")
-        efficient_frontier = get_efficient_frontier(
-            returns, 
-            args.risk_free_rate, 
-            args.frequency, 
-            points=50, 
-            min_weight=args.min_weight, 
-            max_weight=args.max_weight
-        )
-        
-        # Print summary
-        print("\n--- Portfolio Analysis Summary ---")
-        print("\nCurrent Portfolio:")
-        print(f"Expected Annual Return: {current_portfolio.metrics['expected_return']*100:.2f}%")
-        print(f"Annual Volatility: {current_portfolio.metrics['volatility']*100:.2f}%")
-        print(f"Sharpe Ratio: {current_portfolio.metrics['sharpe_ratio']:.2f}")
-        
-        print("\nOptimal Portfolio:")
-        print(f"Expected Annual Return: {optimal_portfolio['metrics']['expected_return']*100:.2f}%")
-        print(f"Annual Volatility: {optimal_portfolio['metrics']['volatility']*100:.2f}%")
-        print(f"Sharpe Ratio: {optimal_portfolio['metrics']['sharpe_ratio']:.2f}")
-        
-        print("\nOptimal Asset Allocation:")
-        for i, ticker in enumerate(tickers):
-            print(f"{ticker}: {optimal_portfolio['weights'][i]*100:.2f}%")
-        
-        # Generate visualizations
-        print("\nGenerating visualizations...")
-        
-        # Change to output directory
-        original_dir = os.getcwd()
-        os.chdir(args.output_dir)
-        
-        # Add risk-free rate to current_portfolio for the capital market line
-        current_portfolio_dict = {
-            'metrics': current_portfolio.metrics,
-            'weights': current_portfolio.weights,
-            'risk_free_rate': args.risk_free_rate
-        }
-        
-        # Plot efficient frontier
-        print("Plotting efficient frontier...")
-        plt.figure(figsize=(12, 8))
-        plot_efficient_frontier(
-            results, 
-            current_portfolio_dict, 
-            optimal_portfolio, 
-            efficient_frontier,
-            show_plot=not args.no_show
-        )
-        
-        # Plot asset allocation
-        print("Plotting asset allocation...")
-        plot_asset_allocation(
-            {'weights': current_portfolio.weights}, 
-            optimal_portfolio, 
-            tickers,
-            show_plot=not args.no_show
+            args.max_weight, 
+            args.output_dir, 
+            show=not args.no_show
         )
-        
-        # Plot correlation matrix
-        print("Plotting correlation matrix...")
-        plot_correlation_matrix(
-            returns,
-            show_plot=not args.no_show
-        )
-        
-        # Plot performance summary
-        print("Plotting performance summary...")
-        plot_performance_summary(
-            optimal_portfolio,
-            show_plot=not args.no_show
-        )
-        
-        # Return to original directory
-        os.chdir(original_dir)
-        
-        print("\nAnalysis complete!")
-        print(f"Visualization files saved in: {os.path.abspath(args.output_dir)}")
     
     except Exception as e:
         print(f"\nError during analysis: {str(e)}")
@@ -219,6 +289,9 @@ def main():
         traceback.print_exc()
         return 1
     
+    finally:
+        remove_log_handler(handler)
+    
     return 0
 
 if __name__ == "__main__":
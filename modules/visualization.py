@@ -1,11 +1,157 @@
-import matplotlib.pyplot as plt
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
 
-def plot_efficient_frontier(results, current_portfolio, optimal_portfolio, efficient_frontier=None, show_plot=True):
+logger = logging.getLogger(__name__)
+
+# Number of hexagons across the x-axis of the simulated portfolio density
+HEXBIN_GRIDSIZE = 60
+
+# Correlation matrices with more assets than this are drawn without cell values,
+# which would be unreadable at that size
+MAX_ANNOTATED_ASSETS = 20
+
+# Plots are saved as lossy WebP, which every browser supports and which is several
+# times smaller than PNG for these charts at no visible loss
+IMAGE_FORMAT = 'webp'
+PIL_KWARGS = {'quality': 85, 'method': 4}
+
+# Per-thread figures reused between calls (see plot_efficient_frontier)
+_fig_cache = threading.local()
+
+# One process per plot; the pool is created on first use and kept for later plots
+PLOT_WORKERS = 4
+_plot_executor = None
+_plot_executor_lock = threading.Lock()
+
+def _create_figure(figsize, show_plot):
+    """
+    Create a figure for plotting.
+    
+    Figures that are only saved are built directly on the Agg canvas, which
+    bypasses pyplot's global figure registry and GUI backend and is safe to use
+    from worker threads. pyplot is only used when the plot will be shown.
+    """
+    if show_plot:
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=figsize)
+    
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _save_figure(fig, name, description, show_plot, output_dir='.', **savefig_kwargs):
+    """Save a figure as name.IMAGE_FORMAT in output_dir and optionally display it."""
+    filename = os.path.join(output_dir, f'{name}.{IMAGE_FORMAT}')
+    fig.savefig(filename, format=IMAGE_FORMAT, pil_kwargs=PIL_KWARGS, **savefig_kwargs)
+    logger.info(f"Saved {description} plot to '{filename}'")
+    
+    if show_plot:
+        import matplotlib.pyplot as plt
+        plt.show()
+
+def _build_efficient_frontier_figure(fig):
+    """
+    Create the efficient frontier artists on a figure.
+    
+    The artists start with placeholder data and are filled in by
+    _update_efficient_frontier_figure, so a figure can be reused between plots.
+    The simulated portfolio density and its colorbar are created on first update.
+    """
+    ax = fig.add_subplot(111)
+    
+    artists = {
+        'simulated': None,
+        'colorbar': None,
+        'frontier': ax.plot([], [], 'r-', linewidth=3, label='Efficient Frontier')[0],
+        # Drawn above the simulated portfolio density, which is created later
+        'current': ax.scatter([0], [0], marker='*', color='red', s=200, 
+                              label='Current Portfolio', zorder=3),
+        'optimal': ax.scatter([0], [0], marker='X', color='green', s=200, 
+                              label='Optimal Portfolio', zorder=3),
+        'market_line': ax.plot([], [], 'g--', label='Capital Market Line')[0]
+    }
+    
+    ax.set_title('Portfolio Optimization')
+    ax.set_xlabel('Volatility (Risk)')
+    ax.set_ylabel('Expected Annual Return')
+    ax.grid(True)
+    
+    # Lay out on every draw so reused figures adapt to new tick labels
+    fig.set_layout_engine('tight')
+    
+    return ax, artists
+
+def _update_efficient_frontier_figure(ax, artists, results, current_portfolio, 
+                                      optimal_portfolio, efficient_frontier):
+    """Update the efficient frontier artists in place with new data."""
+    # Simulated portfolios, drawn as a hexagonal density colored by mean Sharpe ratio.
+    # A hexbin is a single mesh however many portfolios were simulated. Its bins
+    # depend on the data, so it is recreated rather than updated.
+    if artists['simulated'] is not None:
+        artists['simulated'].remove()
+    simulated = ax.hexbin(results[:, 1], results[:, 0], C=results[:, 2], 
+                          reduce_C_function=np.mean, gridsize=HEXBIN_GRIDSIZE, 
+                          cmap='viridis', mincnt=1)
+    artists['simulated'] = simulated
+    if artists['colorbar'] is None:
+        artists['colorbar'] = ax.figure.colorbar(simulated, ax=ax, label='Sharpe Ratio')
+    else:
+        artists['colorbar'].update_normal(simulated)
+    
+    # Efficient frontier, if provided
+    frontier = artists['frontier']
+    if efficient_frontier is not None:
+        frontier.set_data(efficient_frontier['volatility'], efficient_frontier['return'])
+    else:
+        frontier.set_data([], [])
+    
+    # Current and optimal portfolios
+    artists['current'].set_offsets([[current_portfolio['metrics']['volatility'], 
+                                     current_portfolio['metrics']['expected_return']]])
+    artists['optimal'].set_offsets([[optimal_portfolio['metrics']['volatility'], 
+                                     optimal_portfolio['metrics']['expected_return']]])
+    
+    # Capital market line through the optimal (maximum Sharpe ratio) portfolio
+    x_values = [0, optimal_portfolio['metrics']['volatility'] * 1.5]
+    y_values = [current_portfolio['risk_free_rate'], 
+               current_portfolio['risk_free_rate'] + 
+               optimal_portfolio['metrics']['sharpe_ratio'] * x_values[1]]
+    artists['market_line'].set_data(x_values, y_values)
+    
+    # relim() only accounts for lines, so add the simulated and highlighted points explicitly
+    ax.relim()
+    ax.update_datalim(np.column_stack((results[:, 1], results[:, 0])))
+    for collection in (artists['current'], artists['optimal']):
+        ax.update_datalim(collection.get_offsets())
+    ax.autoscale_view()
+    
+    # Rebuilt since the frontier entry depends on the data
+    handles = [artists['current'], artists['optimal'], artists['market_line']]
+    if efficient_frontier is not None:
+        handles.insert(0, frontier)
+    ax.legend(handles=handles)
+
+def plot_efficient_frontier(results, current_portfolio, optimal_portfolio, efficient_frontier=None, show_plot=True, 
+                            output_dir='.'):
     """
     Plot the efficient frontier and highlight current and optimal portfolios.
     
+    When the plot is only saved, the figure is cached per thread and its
+    artists are updated in place on subsequent calls.
+    
     Parameters:
     -----------
     results : np.ndarray
@@ -18,52 +164,30 @@ def plot_efficient_frontier(results, current_portfolio, optimal_portfolio, effic
         DataFrame with efficient frontier points
     show_plot : bool, default=True
         Whether to display the plot (plt.show()) or just save to file
+    output_dir : str, default='.'
+        Directory to save the plot in
     """
-    # Plot simulated portfolios
-    plt.scatter(results[:, 1], results[:, 0], c=results[:, 2], cmap='viridis', 
-                marker='o', s=10, alpha=0.3)
-    plt.colorbar(label='Sharpe Ratio')
-    
-    # Plot efficient frontier if provided
-    if efficient_frontier is not None:
-        plt.plot(efficient_frontier['volatility'], efficient_frontier['return'], 
-                'r-', linewidth=3, label='Efficient Frontier')
-    
-    # Highlight current portfolio
-    plt.scatter(current_portfolio['metrics']['volatility'], 
-                current_portfolio['metrics']['expected_return'], 
-                marker='*', color='red', s=200, label='Current Portfolio')
-    
-    # Highlight optimal portfolio
-    plt.scatter(optimal_portfolio['metrics']['volatility'], 
-                optimal_portfolio['metrics']['expected_return'], 
-                marker='X', color='green', s=200, label='Optimal Portfolio')
-    
-    # Add capital market line if maximizing Sharpe ratio
-    max_sharpe_port = optimal_portfolio
-    if max_sharpe_port is not None:
-        x_values = [0, max_sharpe_port['metrics']['volatility'] * 1.5]
-        y_values = [current_portfolio['risk_free_rate'], 
-                   current_portfolio['risk_free_rate'] + 
-                   max_sharpe_port['metrics']['sharpe_ratio'] * x_values[1]]
-        plt.plot(x_values, y_values, 'g--', label='Capital Market Line')
-    
-    plt.title('Portfolio Optimization')
-    plt.xlabel('Volatility (Risk)')
-    plt.ylabel('Expected Annual Return')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.tight_layout()
-    plt.savefig('efficient_frontier.png')
-    print("Saved efficient frontier plot to 'efficient_frontier.png'")
-    
     if show_plot:
-        plt.show()
+        fig = _create_figure((12, 8), show_plot)
+        ax, artists = _build_efficient_frontier_figure(fig)
     else:
-        plt.close()
+        cached = getattr(_fig_cache, 'efficient_frontier', None)
+        if cached is None:
+            fig = _create_figure((12, 8), show_plot)
+            cached = (fig,) + _build_efficient_frontier_figure(fig)
+            _fig_cache.efficient_frontier = cached
+        fig, ax, artists = cached
+    
+    _update_efficient_frontier_figure(ax, artists, results, current_portfolio, 
+                                      optimal_portfolio, efficient_frontier)
+    _save_figure(fig, 'efficient_frontier', 'efficient frontier', show_plot, output_dir)
 
-def plot_asset_allocation(current_portfolio, optimal_portfolio, assets, show_plot=True):
+def _allocation_labels(weights, assets):
+    """Build pie labels with the asset name and its share, formatted in one pass."""
+    percentages = np.char.mod('%.1f%%', weights / weights.sum() * 100)
+    return [f'{asset}\n{percentage}' for asset, percentage in zip(assets, percentages)]
+
+def plot_asset_allocation(current_portfolio, optimal_portfolio, assets, show_plot=True, output_dir='.'):
     """
     Plot pie charts comparing current and optimal asset allocations.
     
@@ -77,27 +201,54 @@ def plot_asset_allocation(current_portfolio, optimal_portfolio, assets, show_plo
         List of asset names
     show_plot : bool, default=True
         Whether to display the plot (plt.show()) or just save to file
+    output_dir : str, default='.'
+        Directory to save the plot in
     """
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 7))
+    fig = _create_figure((14, 7), show_plot)
+    ax1, ax2 = fig.subplots(1, 2)
     
     # Current allocation
-    ax1.pie(current_portfolio['weights'], labels=assets, autopct='%1.1f%%')
+    weights = np.asarray(current_portfolio['weights'])
+    ax1.pie(weights, labels=_allocation_labels(weights, assets))
     ax1.set_title('Current Asset Allocation')
     
     # Optimal allocation
-    ax2.pie(optimal_portfolio['weights'], labels=assets, autopct='%1.1f%%')
+    weights = np.asarray(optimal_portfolio['weights'])
+    ax2.pie(weights, labels=_allocation_labels(weights, assets))
     ax2.set_title('Optimal Asset Allocation')
     
-    plt.tight_layout(pad=3.0)
-    plt.savefig('asset_allocation.png')
-    print("Saved asset allocation plot to 'asset_allocation.png'")
+    fig.tight_layout(pad=3.0)
+    _save_figure(fig, 'asset_allocation', 'asset allocation', show_plot, output_dir)
+
+def _annotate_cells(ax, labels, fontsize=10):
+    """
+    Write a label centered on each cell of an image plot as a single artist.
     
-    if show_plot:
-        plt.show()
-    else:
-        plt.close()
+    Each distinct label is converted to a glyph outline once, and all cells are
+    drawn as one PathCollection. This renders much faster than one Text artist
+    per cell, which matplotlib lays out and draws individually.
+    """
+    unique_labels, label_index = np.unique(labels, return_inverse=True)
+    
+    # Glyph outlines in points, centered on the origin
+    prop = FontProperties(size=fontsize)
+    paths = []
+    for label in unique_labels:
+        path = TextPath((0, 0), label, prop=prop)
+        extents = path.get_extents()
+        paths.append(path.transformed(Affine2D().translate(-(extents.x0 + extents.x1) / 2, 
+                                                           -(extents.y0 + extents.y1) / 2)))
+    
+    rows, cols = np.indices(labels.shape).reshape(2, -1)
+    collection = PathCollection([paths[i] for i in label_index.ravel()], 
+                                offsets=np.column_stack((cols, rows)), 
+                                offset_transform=ax.transData, 
+                                facecolors='black', edgecolors='none')
+    # Points to display units, following the figure dpi when saving
+    collection.set_transform(Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans)
+    ax.add_collection(collection, autolim=False)
 
-def plot_correlation_matrix(returns, show_plot=True):
+def plot_correlation_matrix(returns, show_plot=True, output_dir='.'):
     """
     Plot correlation matrix of asset returns.
     
@@ -107,33 +258,29 @@ def plot_correlation_matrix(returns, show_plot=True):
         DataFrame with asset returns
     show_plot : bool, default=True
         Whether to display the plot (plt.show()) or just save to file
+    output_dir : str, default='.'
+        Directory to save the plot in
     """
-    corr_matrix = returns.corr()
-    
-    plt.figure(figsize=(10, 8))
-    plt.imshow(corr_matrix, cmap='coolwarm')
-    plt.colorbar(label='Correlation')
+    corr_matrix = np.atleast_2d(np.corrcoef(returns.to_numpy(), rowvar=False))
+    assets = returns.columns.to_list()
     
-    # Add correlation values
-    for i in range(len(corr_matrix)):
-        for j in range(len(corr_matrix)):
-            plt.text(j, i, f'{corr_matrix.iloc[i, j]:.2f}', 
-                    ha='center', va='center', color='black')
+    fig = _create_figure((10, 8), show_plot)
+    ax = fig.add_subplot(111)
+    image = ax.imshow(corr_matrix, cmap='coolwarm')
+    fig.colorbar(image, ax=ax, label='Correlation')
     
-    plt.xticks(range(len(corr_matrix.columns)), corr_matrix.columns, rotation=45)
-    plt.yticks(range(len(corr_matrix.columns)), corr_matrix.columns)
+    # Add correlation values, formatted in one pass over the raw array
+    if len(assets) <= MAX_ANNOTATED_ASSETS:
+        _annotate_cells(ax, np.char.mod('%.2f', corr_matrix))
     
-    plt.title('Asset Correlation Matrix')
-    plt.tight_layout()
-    plt.savefig('correlation_matrix.png')
-    print("Saved correlation matrix plot to 'correlation_matrix.png'")
+    ax.set_xticks(range(len(assets)), assets, rotation=45)
+    ax.set_yticks(range(len(assets)), assets)
     
-    if show_plot:
-        plt.show()
-    else:
-        plt.close()
+    ax.set_title('Asset Correlation Matrix')
+    fig.tight_layout()
+    _save_figure(fig, 'correlation_matrix', 'correlation matrix', show_plot, output_dir)
 
-def plot_performance_summary(portfolio, show_plot=True):
+def plot_performance_summary(portfolio, show_plot=True, output_dir='.'):
     """
     Display portfolio performance metrics as a visual table.
     
@@ -143,12 +290,12 @@ def plot_performance_summary(portfolio, show_plot=True):
         Dictionary with portfolio metrics
     show_plot : bool, default=True
         Whether to display the plot (plt.show()) or just save to file
+    output_dir : str, default='.'
+        Directory to save the plot in
     """
-    import matplotlib.pyplot as plt
-    from matplotlib.table import Table
-    
     # Create figure and axis without visible axes
-    fig, ax = plt.subplots(figsize=(10, 5))
+    fig = _create_figure((10, 5), show_plot)
+    ax = fig.add_subplot(111)
     ax.axis('off')
     ax.axis('tight')
     
@@ -186,7 +333,7 @@ def plot_performance_summary(portfolio, show_plot=True):
     table.scale(1, 1.5)
     
     # Add title
-    plt.suptitle('Portfolio Performance Metrics', fontsize=16, y=0.95)
+    fig.suptitle('Portfolio Performance Metrics', fontsize=16, y=0.95)
     
     # Add footer with explanation
     footer_text = (
@@ -196,14 +343,112 @@ def plot_performance_summary(portfolio, show_plot=True):
     fig.text(0.5, 0.01, footer_text, ha='center', fontsize=9, style='italic')
     
     # Adjust layout
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.85, bottom=0.1)
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.85, bottom=0.1)
     
-    # Save figure
-    plt.savefig('performance_summary.png', dpi=300, bbox_inches='tight')
-    print("Saved performance summary plot to 'performance_summary.png'")
+    # Save figure. The layout above already fits the figure, so bbox_inches='tight'
+    # would only add a second render pass to measure it again
+    _save_figure(fig, 'performance_summary', 'performance summary', show_plot, output_dir,
+                 dpi=120)
+
+def _init_plot_worker():
+    """Select the non-interactive backend and warm it up in plot worker processes."""
+    import matplotlib
+    matplotlib.use('Agg')
     
-    if show_plot:
-        plt.show()
-    else:
-        plt.close()
+    # Render some text once so the first plot does not pay for loading the font
+    # cache, the default font, the Agg backend and the image encoder
+    fig = Figure()
+    fig.text(0.5, 0.5, '0')
+    fig.savefig(io.BytesIO(), format=IMAGE_FORMAT)
+
+def _plot_worker(job):
+    """Render one plot job and return the messages it logged."""
+    func, args, kwargs = job
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        func(*args, **kwargs)
+    finally:
+        logger.removeHandler(handler)
+    return output.getvalue().splitlines()
+
+def _noop():
+    """Job used to start the plot worker processes."""
+
+def get_plot_executor():
+    """Return the shared plot process pool, creating it if needed."""
+    global _plot_executor
+    with _plot_executor_lock:
+        if _plot_executor is None:
+            # Spawn rather than fork, since the web app calls this from worker threads.
+            # Workers only import this module, not the rest of the analysis.
+            _plot_executor = ProcessPoolExecutor(
+                max_workers=PLOT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_plot_worker
+            )
+        return _plot_executor
+
+def _discard_plot_executor(executor):
+    """Drop a broken plot process pool so the next call creates a new one."""
+    global _plot_executor
+    with _plot_executor_lock:
+        if _plot_executor is executor:
+            _plot_executor = None
+    executor.shutdown(wait=False)
+
+def _forget_plot_executor():
+    """Drop the plot process pool inherited by a forked child, which cannot use it."""
+    global _plot_executor, _plot_executor_lock
+    # The pool's manager thread and worker processes belong to the parent, so
+    # submitting to it would wait forever. The child creates its own when needed.
+    _plot_executor = None
+    _plot_executor_lock = threading.Lock()
+
+# E.g. WSGI servers that load the app in a master process and fork the workers
+os.register_at_fork(after_in_child=_forget_plot_executor)
+
+def start_plot_workers():
+    """Start and warm up the plot worker processes ahead of the first plots."""
+    executor = get_plot_executor()
+    # Workers are started as jobs arrive, so submit one per worker
+    for _ in range(PLOT_WORKERS):
+        executor.submit(_noop)
+
+def generate_plots(jobs, show_plot=True, parallel=False):
+    """
+    Run plot jobs, optionally in parallel in the shared plot process pool.
+    
+    Parameters:
+    -----------
+    jobs : list
+        List of (description, func, args, kwargs) tuples
+    show_plot : bool, default=True
+        Whether to display the plots, which requires rendering them in this process
+    parallel : bool, default=False
+        Whether to render the plots in the plot process pool when they are only saved
+    """
+    if show_plot or not parallel:
+        for description, func, args, kwargs in jobs:
+            logger.info(f"Plotting {description}...")
+            func(*args, **kwargs)
+        return
+    
+    worker_jobs = [job[1:] for job in jobs]
+    executor = get_plot_executor()
+    try:
+        outputs = list(executor.map(_plot_worker, worker_jobs))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed when out of memory), which breaks the whole
+        # pool. Replace it and retry once.
+        logger.info("Plot worker pool broke, restarting it")
+        _discard_plot_executor(executor)
+        outputs = list(get_plot_executor().map(_plot_worker, worker_jobs))
+    
+    for (description, _, _, _), messages in zip(jobs, outputs):
+        logger.info(f"Plotting {description}...")
+        for message in messages:
+            logger.info(message)
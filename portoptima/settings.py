@@ -235,3 +235,4 @@ PORTOPTIMA_DEFAULT_INTERVAL = '1d'
 PORTOPTIMA_DEFAULT_RISK_FREE_RATE = 0.02
 PORTOPTIMA_DEFAULT_FREQUENCY = 'daily'
 PORTOPTIMA_DEFAULT_NUM_SIMULATIONS = 5000
+PORTOPTIMA_MAX_WORKERS = 2  # Analyses run concurrently in the background
@@ -1,6 +1,39 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+# Entry points of WSGI/ASGI servers, which set up Django while they are imported
+SERVER_MODULES = ('portoptima.wsgi', 'portoptima.asgi')
+
+
+def _is_server_process():
+    """Whether this process serves requests, rather than running a command or script."""
+    if any(name in sys.modules for name in SERVER_MODULES):
+        return True
+    
+    # runserver sets up Django before loading the WSGI application. With autoreload,
+    # it serves from a child process started with RUN_MAIN set.
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    return '--noreload' in sys.argv or os.environ.get('RUN_MAIN') == 'true'
 
 
 class WebConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'web'
+    
+    def ready(self):
+        """Start the plot workers with the server rather than in the first analysis."""
+        if not _is_server_process():
+            return
+        
+        modules_dir = os.path.join(settings.BASE_DIR, 'modules')
+        if modules_dir not in sys.path:
+            sys.path.append(modules_dir)
+        
+        # The workers load matplotlib, the font cache and the image encoder as they
+        # start, in the background
+        from visualization import start_plot_workers
+        start_plot_workers()
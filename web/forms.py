@@ -1,3 +1,4 @@
+import numpy as np
 from django import forms
 
 class PortfolioAnalysisForm(forms.Form):
@@ -96,7 +97,9 @@ class PortfolioAnalysisForm(forms.Form):
             return None  # Equal weights will be assigned
         
         try:
-            weights = [float(w) for w in weights_str.split()]
+            # Parsed in one call; unlike np.fromstring, invalid tokens raise instead of
+            # silently ending the parse
+            weights = np.array(weights_str.split(), dtype=np.float64)
             
             # Check if number of weights matches number of tickers
             tickers = self.cleaned_data.get('tickers')
@@ -106,9 +109,9 @@ class PortfolioAnalysisForm(forms.Form):
                 )
             
             # Check if weights are positive
-            if any(w < 0 for w in weights):
+            if (weights < 0).any():
                 raise forms.ValidationError("All weights must be positive")
                 
-            return weights
+            return weights.tolist()  # Plain floats, so the cleaned data stays JSON-serializable
         except ValueError:
             raise forms.ValidationError("Weights must be valid numbers separated by spaces")
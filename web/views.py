@@ -1,7 +1,9 @@
 import os
 import uuid
 import sys
+import logging
 import threading
+from pathlib import Path
 from django.shortcuts import render, redirect
 from django.http import JsonResponse, HttpResponse
 from django.conf import settings
@@ -15,6 +17,64 @@ from datetime import datetime
 if not os.path.join(settings.BASE_DIR, 'modules') in sys.path:
     sys.path.append(os.path.join(settings.BASE_DIR, 'modules'))
 
+# Images generated by an analysis, keyed by the name used in the template
+IMAGE_FILES = {
+    'efficient_frontier': 'efficient_frontier.webp',
+    'asset_allocation': 'asset_allocation.webp',
+    'correlation_matrix': 'correlation_matrix.webp',
+    'performance_summary': 'performance_summary.webp'
+}
+
+# Where analyses write their images, and the URL they are served from
+GENERATED_FILES_ROOT = Path(settings.GENERATED_FILES_ROOT)
+GENERATED_FILES_URL = f"{settings.MEDIA_URL}generated/"
+
+# Analysis ID -> keys of the images generated so far, for analyses started by this
+# process. Lets the results page be polled without touching the filesystem. Entries
+# are dropped once served as complete, and the oldest beyond MAX_TRACKED_ANALYSES
+# (e.g. failed analyses) are evicted; both fall back to the filesystem.
+MAX_TRACKED_ANALYSES = 256
+ANALYSIS_STATUS = {}
+_status_lock = threading.Lock()
+
+# Bounds how many background analyses run at once. Each still runs on a daemon
+# thread, so queued analyses do not hold up the process at exit (e.g. Ctrl-C or
+# runserver's autoreload).
+_ANALYSIS_SLOTS = threading.BoundedSemaphore(settings.PORTOPTIMA_MAX_WORKERS)
+
+def _register_analysis(analysis_id):
+    """Record that an analysis has started and has no images yet."""
+    with _status_lock:
+        ANALYSIS_STATUS[analysis_id] = set()
+        
+        # Dicts keep insertion order, so the first entries are the oldest
+        while len(ANALYSIS_STATUS) > MAX_TRACKED_ANALYSES:
+            del ANALYSIS_STATUS[next(iter(ANALYSIS_STATUS))]
+
+def _start_analysis(data, output_dir):
+    """Run an analysis in the background, once fewer than the maximum are running."""
+    def run_in_slot():
+        with _ANALYSIS_SLOTS:
+            run_analysis(data, output_dir)
+    
+    thread = threading.Thread(target=run_in_slot, name='portoptima-analysis')
+    thread.daemon = True
+    thread.start()
+
+def _generated_images(output_dir):
+    """Return the keys of the images in an output directory, listing it once."""
+    with os.scandir(output_dir) as entries:
+        filenames = {entry.name for entry in entries}
+    return {key for key, filename in IMAGE_FILES.items() if filename in filenames}
+
+def _record_images(analysis_id, output_dir):
+    """Record the images an analysis has written to its output directory."""
+    generated = _generated_images(output_dir)
+    with _status_lock:
+        # Evicted analyses are left to the filesystem
+        if analysis_id in ANALYSIS_STATUS:
+            ANALYSIS_STATUS[analysis_id].update(generated)
+
 def home(request):
     """Home page with portfolio analysis form"""
     form = PortfolioAnalysisForm()
@@ -34,12 +94,8 @@ def analyze_portfolio_api(request):
     os.makedirs(output_dir, exist_ok=True)
     
     # Start analysis in background
-    thread = threading.Thread(
-        target=run_analysis,
-        args=(data, output_dir)
-    )
-    thread.daemon = True
-    thread.start()
+    _register_analysis(analysis_id)
+    _start_analysis(data, output_dir)
     
     # Return ID and URL for results
     return Response({
@@ -63,12 +119,8 @@ def analyze_portfolio(request):
             data = form.cleaned_data
             
             # Start analysis in background
-            thread = threading.Thread(
-                target=run_analysis,
-                args=(data, output_dir)
-            )
-            thread.daemon = True
-            thread.start()
+            _register_analysis(analysis_id)
+            _start_analysis(data, output_dir)
             
             # Redirect to results page
             return redirect('web:results', analysis_id=analysis_id)
@@ -79,35 +131,36 @@ def analyze_portfolio(request):
 
 def results(request, analysis_id):
     """Display portfolio analysis results"""
-    output_dir = os.path.join(settings.GENERATED_FILES_ROOT, analysis_id)
+    with _status_lock:
+        generated = ANALYSIS_STATUS.get(analysis_id)
+        generated = set(generated) if generated is not None else None
     
-    # Check if output directory exists
-    if not os.path.exists(output_dir):
-        return render(request, 'web/error.html', {
-            'error': 'Analysis not found',
-            'message': 'The requested analysis does not exist or has been deleted.'
-        })
+    if generated is None:
+        # Not started by this process (e.g. before a restart), so check the filesystem
+        try:
+            generated = _generated_images(GENERATED_FILES_ROOT / analysis_id)
+        except FileNotFoundError:
+            return render(request, 'web/error.html', {
+                'error': 'Analysis not found',
+                'message': 'The requested analysis does not exist or has been deleted.'
+            })
+    
+    elif len(generated) == len(IMAGE_FILES):
+        # Finished, so later requests check the filesystem and notice deleted results
+        with _status_lock:
+            ANALYSIS_STATUS.pop(analysis_id, None)
     
     # Check if analysis is complete
     results_data = {}
     
-    # Check for generated images
-    image_files = {
-        'efficient_frontier': 'efficient_frontier.png',
-        'asset_allocation': 'asset_allocation.png',
-        'correlation_matrix': 'correlation_matrix.png',
-        'performance_summary': 'performance_summary.png'
-    }
-    
+    # Get relative paths of the generated images for the template
     images = {}
-    for key, filename in image_files.items():
-        filepath = os.path.join(output_dir, filename)
-        if os.path.exists(filepath):
-            # Get relative path for the template
-            images[key] = os.path.join(settings.MEDIA_URL, 'generated', analysis_id, filename)
+    for key, filename in IMAGE_FILES.items():
+        if key in generated:
+            images[key] = f"{GENERATED_FILES_URL}{analysis_id}/{filename}"
     
     # Check if all images are generated
-    is_complete = len(images) == len(image_files)
+    is_complete = len(images) == len(IMAGE_FILES)
     
     context = {
         'analysis_id': analysis_id,
@@ -120,12 +173,16 @@ def results(request, analysis_id):
 
 def run_analysis(data, output_dir):
     """Run portfolio analysis using modules"""
+    # Log the analysis to its own file. Concurrent analyses log through the same
+    # loggers from other threads, so only records from this thread are kept.
+    handler = logging.FileHandler(os.path.join(output_dir, 'log.txt'))
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    thread_id = threading.get_ident()
+    handler.addFilter(lambda record: record.thread == thread_id)
+    
     try:
         # Import your modules
-        from portfolio_analyzer import main
-        import sys
-        from io import StringIO
-        import contextlib
+        from portfolio_analyzer import run, add_log_handler, remove_log_handler
         
         # Prepare arguments for your analyzer
         tickers = data.get('tickers', [])
@@ -137,32 +194,23 @@ def run_analysis(data, output_dir):
         min_weight = data.get('min_weight', 0)
         max_weight = data.get('max_weight', 1)
         
-        # Prepare command-line arguments
-        sys.argv = ['portfolio_analyzer.py']
-        sys.argv.extend(['--tickers'] + tickers)
-        
-        if weights:
-            sys.argv.extend(['--weights'] + [str(w) for w in weights])
-        
-        sys.argv.extend([
-            '--period', period,
-            '--interval', interval,
-            '--risk-free-rate', str(risk_free_rate),
-            '--optimization', optimization,
-            '--min-weight', str(min_weight),
-            '--max-weight', str(max_weight),
-            '--output-dir', output_dir,
-            '--no-show'  # Don't show interactive plots
-        ])
-        
-        # Redirect stdout to capture output
-        output = StringIO()
-        with contextlib.redirect_stdout(output):
-            main()
-        
-        # Log the output
-        with open(os.path.join(output_dir, 'log.txt'), 'w') as f:
-            f.write(output.getvalue())
+        add_log_handler(handler)
+        try:
+            run(
+                tickers, 
+                weights, 
+                period=period, 
+                interval=interval, 
+                risk_free_rate=float(risk_free_rate), 
+                optimization=optimization, 
+                min_weight=float(min_weight), 
+                max_weight=float(max_weight), 
+                output_dir=output_dir, 
+                show=False,  # Don't show interactive plots
+                parallel_plots=True  # The server keeps the plot workers between analyses
+            )
+        finally:
+            remove_log_handler(handler)
             
     except Exception as e:
         # Log any errors
@@ -171,3 +219,9 @@ def run_analysis(data, output_dir):
         import traceback
         with open(os.path.join(output_dir, 'traceback.log'), 'w') as f:
             traceback.print_exc(file=f)
+    
+    finally:
+        handler.close()
+        
+        # The output directory is named after the analysis ID
+        _record_images(os.path.basename(output_dir), output_dir)